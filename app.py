@@ -8,6 +8,8 @@ import time
 import uuid
 import logging
 import hashlib
+import ipaddress
+import threading
 from datetime import datetime
 
 # 必须首先导入 streamlit
@@ -20,14 +22,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 局部重跑装饰器：旧版 Streamlit 无 st.fragment 时退化为普通函数
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
 # 尝试导入配置模块
 try:
-    from config.settings import AppConfig, UIText, CSS_STYLES
+    from config.settings import AppConfig, UIText, CSS_STYLES, inject_css, render_html
     CONFIG_AVAILABLE = True
     logger.info("Config modules loaded successfully")
 except ImportError as e:
     CONFIG_AVAILABLE = False
     logger.warning(f"配置模块不可用: {e}")
+    
+    def render_html(html):
+        """输出 HTML 片段（备用）"""
+        st.markdown(html, unsafe_allow_html=True)
 
 # 尝试导入工具模块
 try:
@@ -39,7 +48,7 @@ except ImportError:
     logger.warning("文件处理器不可用")
 
 try:
-    from utils.translator import Translator
+    from utils.translator import Translator, ContentValidator
     TRANSLATOR_AVAILABLE = True
     logger.info("Translator loaded successfully")
 except ImportError:
@@ -83,7 +92,7 @@ st.set_page_config(
 # 注入基础CSS样式
 if CONFIG_AVAILABLE:
     try:
-        st.markdown(CSS_STYLES, unsafe_allow_html=True)
+        inject_css(CSS_STYLES)
         logger.info("CSS styles injected successfully")
     except Exception as e:
         logger.warning(f"CSS injection failed: {e}")
@@ -215,6 +224,7 @@ def get_complete_language_config(language):
             "supported_formats": "支持PDF、TXT、DOCX格式",
             "translate_button": "开始翻译学习",
             "error_empty_input": "请输入内容",
+            "confirm_non_medical": "我确认这是医学报告，仍要翻译",
             "lang_selection": "选择语言"
         },
         "繁體中文": {
@@ -235,6 +245,7 @@ def get_complete_language_config(language):
             "supported_formats": "支持PDF、TXT、DOCX格式",
             "translate_button": "開始翻譯學習",
             "error_empty_input": "請輸入內容",
+            "confirm_non_medical": "我確認這是醫學報告，仍要翻譯",
             "lang_selection": "選擇語言"
         }
     }
@@ -246,12 +257,9 @@ def get_complete_language_config(language):
 
 def initialize_session_state():
     """初始化会话状态"""
-    if 'translation_count' not in st.session_state:
-        st.session_state.translation_count = 0
-    if 'daily_limit' not in st.session_state:
-        st.session_state.daily_limit = 3
-    if 'language' not in st.session_state:
-        st.session_state.language = "简体中文"
+    st.session_state.setdefault('translation_count', 0)
+    st.session_state.setdefault('daily_limit', 3)
+    st.session_state.setdefault('language', "简体中文")
     if 'user_session_id' not in st.session_state:
         st.session_state.user_session_id = str(uuid.uuid4())[:8]
     if 'permanent_user_id' not in st.session_state:
@@ -260,14 +268,11 @@ def initialize_session_state():
         raw_data = f"{st.session_state.user_session_id}_{today}"
         user_hash = hashlib.sha256(raw_data.encode()).hexdigest()[:16]
         st.session_state.permanent_user_id = f"user_{user_hash}"
-    if 'feedback_count' not in st.session_state:
-        st.session_state.feedback_count = 0
+    st.session_state.setdefault('feedback_count', 0)
     
     # 初始化翻译结果相关状态
-    if 'current_translation' not in st.session_state:
-        st.session_state.current_translation = None
-    if 'show_translation_result' not in st.session_state:
-        st.session_state.show_translation_result = False
+    st.session_state.setdefault('current_translation', None)
+    st.session_state.setdefault('show_translation_result', False)
     
     # 初始化配置对象
     if 'app_config' not in st.session_state:
@@ -339,16 +344,83 @@ def render_disclaimer_fallback(lang_cfg):
     """备用免责声明"""
     st.markdown("### ⚠️ " + lang_cfg['disclaimer_title'])
     
-    for i, item in enumerate(lang_cfg["disclaimer_items"], 1):
-        st.markdown(f"**{i}.** {item}")
+    st.markdown("\n\n".join(
+        f"**{i}.** {item}" for i, item in enumerate(lang_cfg["disclaimer_items"], 1)
+    ))
     
     st.warning("🆘 緊急情況請立即撥打 000")
 
+@st.cache_resource
+def get_usage_quota_store():
+    """服务端配额记录（所有会话共享）：{用户ID: (日期, 已用次数)}"""
+    return {}, threading.Lock()
+
+def get_trusted_client_ip():
+    """
+    获取可信的客户端 IP（仅在配置了可信反向代理层数时使用）
+    
+    X-Forwarded-For 靠前的条目由客户端自行提供，可以伪造；只取自有反向代理
+    追加的那一项（倒数第 N 项）。任何异常值都视为无法获取。
+    """
+    app_config = st.session_state.get('app_config')
+    hops = getattr(app_config, 'QUOTA_TRUSTED_PROXY_HOPS', 0)
+    context = getattr(st, "context", None)
+    if not isinstance(hops, int) or hops <= 0 or context is None:
+        return None
+    headers = getattr(context, "headers", None) or {}
+    forwarded_for = headers.get("X-Forwarded-For")
+    if not isinstance(forwarded_for, str):
+        return None
+    entries = [entry.strip() for entry in forwarded_for.split(",")]
+    if len(entries) < hops:
+        return None
+    try:
+        return str(ipaddress.ip_address(entries[-hops]))
+    except ValueError:
+        return None
+
+def get_quota_user_id():
+    """获取配额用户ID：默认使用会话ID，配置了可信代理时按客户端 IP 的哈希区分"""
+    client_ip = get_trusted_client_ip()
+    if client_ip is None:
+        return st.session_state.user_session_id
+    return "ip_" + hashlib.sha256(client_ip.encode()).hexdigest()[:16]
+
+def sync_translation_count():
+    """以服务端记录校正会话中的使用次数，防止新会话重置配额"""
+    usage, lock = get_usage_quota_store()
+    today = datetime.now().strftime('%Y-%m-%d')
+    with lock:
+        day, count = usage.get(get_quota_user_id(), (today, 0))
+    if day == today and count > st.session_state.translation_count:
+        st.session_state.translation_count = count
+
+def record_translation_usage():
+    """记录一次翻译，同时更新服务端配额和会话计数"""
+    usage, lock = get_usage_quota_store()
+    today = datetime.now().strftime('%Y-%m-%d')
+    uid = get_quota_user_id()
+    with lock:
+        day, count = usage.get(uid, (today, 0))
+        if day != today:
+            # 跨日后清理过期记录，避免记录无限增长
+            for stale_uid in [k for k, (d, _) in usage.items() if d != today]:
+                del usage[stale_uid]
+            count = 0
+        count += 1
+        usage[uid] = (today, count)
+    st.session_state.translation_count = max(st.session_state.translation_count + 1, count)
+
+def get_remaining_translations():
+    """获取剩余翻译次数"""
+    state = st.session_state
+    return state.daily_limit - state.translation_count
+
 def render_usage_status():
     """渲染使用状态"""
     current_usage = st.session_state.translation_count
     daily_limit = st.session_state.daily_limit
-    remaining = daily_limit - current_usage
+    remaining = get_remaining_translations()
     feedback_count = st.session_state.get('feedback_count', 0)
     
     st.markdown("### 📊 使用状态")
@@ -384,7 +456,7 @@ def render_input_section(lang_cfg):
                 logger.info(f"Enhanced UI returned: text_length={len(report_text) if report_text else 0}, file_type={file_type}")
                 
                 # 如果有内容，也存储到标准的 session state 键中
-                if report_text and report_text.strip():
+                if report_text and not report_text.isspace():
                     st.session_state['current_report_text'] = report_text
                     st.session_state['current_file_type'] = file_type
                 
@@ -414,7 +486,7 @@ def render_input_section(lang_cfg):
                 current_input = ui_components.get_current_input()
                 if current_input and isinstance(current_input, tuple) and len(current_input) == 2:
                     text_content, file_type = current_input
-                    if text_content and text_content.strip():
+                    if text_content and not text_content.isspace():
                         logger.info(f"Enhanced UI get_current_input returned: {len(text_content)} chars")
                         return text_content, file_type
             except Exception as e:
@@ -480,8 +552,17 @@ def render_input_section(lang_cfg):
     
     return report_text, file_type
 
-def handle_translation(report_text, file_type, lang_cfg):
-    """处理翻译请求 - 带结果持久化"""
+@st.cache_data(show_spinner=False, max_entries=32)
+def validate_report_input(report_text):
+    """翻译前校验输入（长度与医学术语），不通过时不发起 API 调用；同一文本只验证一次"""
+    if not TRANSLATOR_AVAILABLE:
+        return {"is_valid": True, "length_ok": True, "issues": [], "found_terms": []}
+    
+    validator = ContentValidator(AppConfig())
+    return validator.validate_content(report_text)
+
+def handle_translation(report_text, file_type, lang_cfg, validation):
+    """处理翻译请求 - 带结果持久化（validation 为点击前已完成的内容验证结果）"""
     if not TRANSLATOR_AVAILABLE:
         st.error("❌ 翻译功能不可用，请检查系统配置")
         return
@@ -489,32 +570,30 @@ def handle_translation(report_text, file_type, lang_cfg):
     try:
         translator = Translator()
         
-        # 生成翻译ID
-        translation_id = str(uuid.uuid4())[:16]
+        # 生成翻译ID：会话ID-序号-纳秒时间戳，按时间可排序，无需再取系统随机数
+        translation_id = (
+            f"{st.session_state.user_session_id}-"
+            f"{st.session_state.translation_count + 1}-{time.time_ns():x}"
+        )
         text_hash = hashlib.md5(report_text.encode()).hexdigest()[:16]
         
-        # 验证内容
-        validation = translator.validate_content(report_text)
-        if not validation["is_valid"]:
-            st.warning("⚠️ 内容可能不是完整的医学文献")
-        
         # 执行翻译
         start_time = time.time()
         
-        with st.spinner("正在翻译中..."):
-            # 创建进度条
-            progress_bar = st.progress(0)
+        with st.spinner(lang_cfg.get("processing", "正在翻译中...")):
+            # 流式生成的内容直接显示在状态区
             status_text = st.empty()
             
             result = translator.translate_with_progress(
-                report_text, lang_cfg["code"], progress_bar, status_text
+                report_text, lang_cfg["code"], status_text=status_text
             )
             
             processing_time = time.time() - start_time
         
         if result["success"]:
-            # 增加使用次数
-            st.session_state.translation_count += 1
+            # 增加使用次数（命中缓存的结果不消耗配额）
+            if not result.get("from_cache"):
+                record_translation_usage()
             
             # 记录到 Google Sheets
             log_usage_to_sheets(
@@ -568,7 +647,7 @@ def render_translation_result():
         st.markdown(translation_data['translated_text'])
         
         # 显示剩余次数
-        remaining = st.session_state.daily_limit - st.session_state.translation_count
+        remaining = get_remaining_translations()
         if remaining > 0:
             st.info(f"今日还可使用 {remaining} 次")
         else:
@@ -580,8 +659,10 @@ def render_translation_result():
             translation_data['lang_cfg']
         )
 
+@_fragment
 def render_simple_feedback_section(translation_id, lang_cfg):
-    """渲染简单反馈区域"""
+    """渲染简单反馈区域（作为 fragment，提交反馈只重跑此区域）"""
+    feedback_count = st.session_state.get('feedback_count', 0)
     if FEEDBACK_COMPONENT_AVAILABLE and st.session_state.get('sheets_manager'):
         try:
             # 使用反馈组件
@@ -597,6 +678,10 @@ def render_simple_feedback_section(translation_id, lang_cfg):
     else:
         # 如果反馈组件不可用，使用简单的反馈收集
         render_fallback_feedback(translation_id, lang_cfg)
+    
+    # 提交成功后整页重跑，刷新 fragment 之外使用状态中的反馈次数
+    if st.session_state.get('feedback_count', 0) != feedback_count:
+        st.rerun(**({"scope": "app"} if hasattr(st, "fragment") else {}))
 
 def render_fallback_feedback(translation_id, lang_cfg):
     """备用反馈收集"""
@@ -626,6 +711,8 @@ def render_fallback_feedback(translation_id, lang_cfg):
                 st.success("✅ 感谢您的反馈！")
                 st.balloons()
                 logger.info(f"Fallback feedback submitted for {translation_id}")
+    else:
+        st.info("✅ 感谢您已经提交的反馈！")
 
 def log_usage_to_sheets(translation_id, text_hash, processing_time, file_type, content_length, lang_cfg, validation):
     """记录使用资料到 Google Sheets"""
@@ -662,10 +749,15 @@ def log_usage_to_sheets(translation_id, text_hash, processing_time, file_type, c
             'user_feedback': ''  # 初始为空，反馈时会填入
         }
         
-        sheets_result = st.session_state.sheets_manager.log_usage(usage_data)
+        # 后台写入，Google Sheets 的网络延迟不计入翻译耗时
+        sheets_manager = st.session_state.sheets_manager
+        if hasattr(sheets_manager, 'log_usage_async'):
+            sheets_result = sheets_manager.log_usage_async(usage_data)
+        else:
+            sheets_result = sheets_manager.log_usage(usage_data)
         
         if sheets_result:
-            logger.info(f"成功记录使用资料: {translation_id}")
+            logger.info(f"已提交使用资料记录: {translation_id}")
         else:
             logger.error(f"记录使用资料失败: {translation_id}")
             
@@ -705,13 +797,11 @@ def render_quota_exceeded():
             if st.button("💳 立即升级", use_container_width=True):
                 st.info("访问 radiai.care/upgrade")
 
-def render_footer():
+def render_footer(lang_cfg):
     """渲染页脚信息"""
-    # 获取当前语言配置
-    lang_cfg = get_language_config(st.session_state.language)
     
     # 隐私政策和使用条款
-    st.markdown(f"""
+    render_html(f"""
     <div style="
         text-align: center;
         color: #666;
@@ -748,10 +838,10 @@ def render_footer():
             <strong>{"联系我们" if st.session_state.language == "简体中文" else "聯繫我們"}：</strong>{lang_cfg['footer_contact_text']}
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """)
     
     # 版本信息
-    st.markdown(f"""
+    render_html(f"""
     <div style="
         text-align: center;
         padding: 1rem 1.5rem;
@@ -776,13 +866,14 @@ def render_footer():
             {lang_cfg['footer_app_name']} | {lang_cfg['footer_service_desc']}
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """)
 
 def main():
     """主应用程序函数"""
     try:
         # 初始化会话状态
         initialize_session_state()
+        sync_translation_count()
         
         # 获取语言配置
         lang_cfg = get_language_config(st.session_state.language)
@@ -803,9 +894,6 @@ def main():
         else:
             logger.info("Using Enhanced UI Components for language selection")
         
-        # 重新获取语言配置（可能已更改）
-        lang_cfg = get_language_config(st.session_state.language)
-        
         # 渲染免责声明 - 优先使用 Enhanced UI Components
         disclaimer_success = render_with_ui_components('render_disclaimer', lang_cfg)
         if not disclaimer_success:
@@ -820,7 +908,7 @@ def main():
         # 检查配额
         if remaining <= 0:
             render_quota_exceeded()
-            render_footer()
+            render_footer(lang_cfg)
             return
         
         # ========== 显示保存的翻译结果（在输入之前） ==========
@@ -835,9 +923,19 @@ def main():
             logger.info(f"render_input_section returned: text_length={len(report_text) if report_text else 0}, file_type={file_type}")
             
             # 翻译按钮
-            if report_text and report_text.strip():
-                if st.button(lang_cfg["translate_button"], type="primary", use_container_width=True):
-                    handle_translation(report_text, file_type, lang_cfg)
+            if report_text and not report_text.isspace():
+                # 点击前先验证，内容无效时禁用按钮，避免无效的 API 调用
+                validation = validate_report_input(report_text)
+                can_translate = validation["is_valid"]
+                if not can_translate:
+                    st.warning("⚠️ 内容可能不是完整的医学文献：" + "；".join(validation["issues"]))
+                    # 仅医学术语不足时允许用户确认后继续；过短或过长的内容始终不发送
+                    if validation.get("length_ok"):
+                        can_translate = st.checkbox(lang_cfg["confirm_non_medical"], key="confirm_non_medical")
+                
+                if st.button(lang_cfg["translate_button"], type="primary", use_container_width=True,
+                             disabled=not can_translate):
+                    handle_translation(report_text, file_type, lang_cfg, validation)
             else:
                 # 显示调试信息
                 if file_type in ["enhanced_ui", "processing"]:
@@ -853,7 +951,7 @@ def main():
                 st.rerun()
         
         # 渲染页脚
-        render_footer()
+        render_footer(lang_cfg)
         
     except Exception as e:
         logger.error(f"应用程序运行错误: {e}")
@@ -16,7 +16,75 @@ try:
     import json
     import time
     from datetime import datetime, timedelta
-    from typing import Dict, List, Any, Tuple, Optional
+    from functools import lru_cache
+    from typing import Callable, Dict, List, Any, Tuple, Optional
+    from config.settings import render_html
+    
+    @lru_cache(maxsize=8)
+    def _build_header_html(logo_loader: Optional[Callable[[], Tuple[str, str]]],
+                           title: str, subtitle: str, description: str) -> str:
+        """
+        構建標題區 HTML（每種語言只構建一次）
+        
+        以 Logo 讀取函數而非 Base64 內容作為緩存鍵，避免每次重新運行都生成並哈希整段圖片數據。
+        """
+        logo_html = '<div style="font-size: 3rem; margin-bottom: 0.5rem;">🏥</div>'
+        if logo_loader is not None:
+            try:
+                logo_data, mime_type = logo_loader()
+                logo_html = f'''<img src="data:{mime_type};base64,{logo_data}" width="60" height="60" alt="RadiAI.Care Logo" 
+                             style="border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">'''
+            except Exception:
+                pass
+        
+        return f'''
+                <div class="title-section">
+                    <div class="logo-container">
+                        {logo_html}
+                    </div>
+                    <div class="main-title">{title}</div>
+                    <div class="subtitle">{subtitle}</div>
+                    <div class="description">{description}</div>
+                </div>
+                '''
+    
+    @lru_cache(maxsize=8)
+    def _build_disclaimer_html(title: str, items: Tuple[str, ...]) -> str:
+        """構建免責聲明 HTML（每種語言只構建一次）"""
+        header_html = f"""
+            <div style="
+                background-color: #fff3cd;
+                border-left: 6px solid #ff9800;
+                padding: 1.2rem;
+                border-radius: 8px;
+                margin-top: 1.5rem;
+                box-shadow: 0 2px 8px rgba(255,152,0,0.1);
+            ">
+                <div style="font-weight: bold; font-size: 1.1rem; color: #bf360c;">
+                    ⚠️ {title}
+                </div>
+            </div>
+            """
+        items_html = "".join(
+            f"""
+            <div style="
+                margin: 0.8rem 0;
+                padding: 1rem 1.2rem;
+                background: rgba(255, 255, 255, 0.95);
+                border-radius: 12px;
+                border-left: 5px solid #ff9800;
+                box-shadow: 0 2px 8px rgba(255, 152, 0, 0.1);
+                font-size: 0.95rem;
+                line-height: 1.6;
+                color: #d84315;
+                font-weight: 500;
+            ">
+                <strong style="color: #bf360c;">📌 {i}.</strong> {item}
+            </div>
+            """
+            for i, item in enumerate(items, 1)
+        )
+        return header_html + items_html
     
     class EnhancedUIComponents:
         """增强版UI组件系统 - 修复版"""
@@ -27,38 +95,14 @@ try:
         
         def render_header(self, lang: Dict):
             """渲染标题"""
-            try:
-                logo_data, mime_type = self.config.get_logo_base64()
-                data_uri = f"data:{mime_type};base64,{logo_data}"
-                
-                st.markdown(f'''
-                <div class="title-section">
-                    <div class="logo-container">
-                        <img src="{data_uri}" width="60" height="60" alt="RadiAI.Care Logo" 
-                             style="border-radius: 8px; box-shadow: 0 2px 8px rgba(0,0,0,0.1);">
-                    </div>
-                    <div class="main-title">{lang["app_title"]}</div>
-                    <div class="subtitle">{lang["app_subtitle"]}</div>
-                    <div class="description">{lang["app_description"]}</div>
-                </div>
-                ''', unsafe_allow_html=True)
-                
-            except Exception:
-                st.markdown(f'''
-                <div class="title-section">
-                    <div class="logo-container">
-                        <div style="font-size: 3rem; margin-bottom: 0.5rem;">🏥</div>
-                    </div>
-                    <div class="main-title">{lang["app_title"]}</div>
-                    <div class="subtitle">{lang["app_subtitle"]}</div>
-                    <div class="description">{lang["app_description"]}</div>
-                </div>
-                ''', unsafe_allow_html=True)
+            header_html = _build_header_html(
+                getattr(self.config, "get_logo_base64", None), lang["app_title"], lang["app_subtitle"], lang["app_description"]
+            )
+            render_html(header_html)
 
         def render_language_selection(self, lang: Dict):
             """渲染语言选择"""
-            st.markdown(f'<div style="text-align:center; margin:1.5rem 0;"><h4>{lang["lang_selection"]}</h4></div>', 
-                       unsafe_allow_html=True)
+            render_html(f'<div style="text-align:center; margin:1.5rem 0;"><h4>{lang["lang_selection"]}</h4></div>')
             
             col1, col2 = st.columns(2)
             with col1:
@@ -74,43 +118,13 @@ try:
 
         def render_disclaimer(self, lang: Dict):
             """渲染免责声明"""
-            st.markdown(f"""
-            <div style="
-                background-color: #fff3cd;
-                border-left: 6px solid #ff9800;
-                padding: 1.2rem;
-                border-radius: 8px;
-                margin-top: 1.5rem;
-                box-shadow: 0 2px 8px rgba(255,152,0,0.1);
-            ">
-                <div style="font-weight: bold; font-size: 1.1rem; color: #bf360c;">
-                    ⚠️ {lang['disclaimer_title']}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-
-            for i, item in enumerate(lang["disclaimer_items"], 1):
-                st.markdown(f"""
-                <div style="
-                    margin: 0.8rem 0;
-                    padding: 1rem 1.2rem;
-                    background: rgba(255, 255, 255, 0.95);
-                    border-radius: 12px;
-                    border-left: 5px solid #ff9800;
-                    box-shadow: 0 2px 8px rgba(255, 152, 0, 0.1);
-                    font-size: 0.95rem;
-                    line-height: 1.6;
-                    color: #d84315;
-                    font-weight: 500;
-                ">
-                    <strong style="color: #bf360c;">📌 {i}.</strong> {item}
-                </div>
-                """, unsafe_allow_html=True)
+            disclaimer_html = _build_disclaimer_html(
+                lang['disclaimer_title'], tuple(lang["disclaimer_items"])
+            )
+            render_html(disclaimer_html)
 
         def render_input_section(self, lang: Dict) -> Tuple[str, str]:
             """渲染输入部分 - 修复版，确保返回内容"""
-            st.markdown('<div class="input-section">', unsafe_allow_html=True)
-            
             # 初始化 session state 中的输入相关键
             if 'enhanced_ui_input_method' not in st.session_state:
                 st.session_state.enhanced_ui_input_method = 'text'
@@ -161,7 +175,6 @@ try:
                     st.session_state['report_text'] = text_input
                 
                 # 返回文本内容
-                st.markdown('</div>', unsafe_allow_html=True)
                 return text_input, "manual"
             
             elif st.session_state.enhanced_ui_input_method == 'file':
@@ -189,24 +202,20 @@ try:
                                 else:
                                     # 如果没有file_handler，尝试简单的文本提取
                                     try:
-                                        import PyMuPDF as fitz
+                                        file_bytes = uploaded_file.getvalue()
                                         if uploaded_file.type == "application/pdf":
-                                            pdf_document = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                                            text_parts = []
-                                            for page_num in range(pdf_document.page_count):
-                                                page = pdf_document[page_num]
-                                                page_text = page.get_text()
-                                                if page_text.strip():
-                                                    text_parts.append(page_text)
-                                            pdf_document.close()
-                                            extracted_text = "\n\n".join(text_parts)
+                                            # 此分支只在 utils.file_handler 不可用時執行，直接導入 PyMuPDF
+                                            import fitz
+                                            with fitz.open(stream=file_bytes, filetype="pdf") as pdf_document:
+                                                page_texts = (page.get_text("text") for page in pdf_document)
+                                                extracted_text = "\n\n".join(
+                                                    text for text in page_texts if text and not text.isspace()
+                                                )
                                             result = {"file_info": {"type": "application/pdf"}}
                                         else:
                                             # 对于非PDF文件，尝试直接读取
-                                            uploaded_file.seek(0)
-                                            content = uploaded_file.read()
                                             try:
-                                                extracted_text = content.decode('utf-8')
+                                                extracted_text = file_bytes.decode('utf-8')
                                                 result = {"file_info": {"type": "text/plain"}}
                                             except:
                                                 extracted_text = ""
@@ -257,11 +266,9 @@ try:
                             st.text_area("提取的内容：", value=preview_text, height=150, disabled=True)
                         
                         # 返回文件内容
-                        st.markdown('</div>', unsafe_allow_html=True)
                         return st.session_state.enhanced_ui_file_content, st.session_state.enhanced_ui_file_type
                     else:
                         # 文件处理失败，返回空内容
-                        st.markdown('</div>', unsafe_allow_html=True)
                         return "", "error"
                 
                 else:
@@ -275,14 +282,11 @@ try:
                                 preview_text += "..."
                             st.text_area("提取的内容：", value=preview_text, height=150, disabled=True)
                         
-                        st.markdown('</div>', unsafe_allow_html=True)
                         return st.session_state.enhanced_ui_file_content, st.session_state.enhanced_ui_file_type
                     else:
-                        st.markdown('</div>', unsafe_allow_html=True)
                         return "", "none"
             
             # 默认返回
-            st.markdown('</div>', unsafe_allow_html=True)
             return "", "none"
 
         def get_current_input(self) -> Tuple[str, str]:
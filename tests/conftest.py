@@ -0,0 +1,6 @@
+"""pytest 配置：將項目根目錄加入導入路徑"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,18 @@
+"""FileHandler 文本提取測試"""
+
+from utils.file_handler import FileHandler
+
+
+def test_extract_txt_utf8():
+    text = "CT 胸部檢查：未見異常。"
+    assert FileHandler._extract_from_txt(text.encode("utf-8")) == text
+
+
+def test_extract_txt_short_gbk():
+    # 短 GBK 文本容易被自動檢測誤判，必須按 GBK 正確解碼
+    text = "肺部结节，建议复查。"
+    assert FileHandler._extract_from_txt(text.encode("gbk")) == text
+
+
+def test_extract_txt_strips_whitespace():
+    assert FileHandler._extract_from_txt("  impression: normal \n".encode("utf-8")) == "impression: normal"
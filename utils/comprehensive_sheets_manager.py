@@ -7,6 +7,8 @@ import base64
 import json
 import logging
 import os
+import queue
+import threading
 import time
 from datetime import datetime, timezone, timedelta
 from typing import Any, Dict, List, Optional, Tuple
@@ -38,6 +40,90 @@ def _get_utc_time() -> datetime:
     """獲取UTC時間"""
     return datetime.now(timezone.utc)
 
+class BackgroundSheetsWriter:
+    """後台寫入器：在守護線程中追加 Google Sheets 數據行，避免阻塞頁面渲染"""
+    
+    # 單次 append_rows 最多合併的行數
+    MAX_BATCH_ROWS = 50
+    # 限流（429）或服務端錯誤（5xx）時的重試次數與初始退避秒數
+    MAX_RETRIES = 2
+    RETRY_BACKOFF_SECONDS = 2.0
+    
+    def __init__(self, max_queue_size: int = 1000):
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+        self._thread.start()
+    
+    def submit_row(self, worksheet, row_data: List[Any]) -> bool:
+        """提交一行待追加的數據，隊列已滿時丟棄並返回 False"""
+        try:
+            self._queue.put_nowait((worksheet, row_data))
+            return True
+        except queue.Full:
+            logger.warning("Sheets write queue is full, dropping row")
+            return False
+    
+    def _run(self):
+        """取出隊列中已積壓的行，按工作表合併為一次 append_rows 調用"""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.MAX_BATCH_ROWS:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # 每個會話各自創建工作表對象，按穩定標識合併，同一工作表只用一個句柄寫入
+            grouped: Dict[Tuple[Any, Any], Tuple[Any, List[List[Any]]]] = {}
+            for worksheet, row_data in batch:
+                key = self._worksheet_key(worksheet)
+                grouped.setdefault(key, (worksheet, []))[1].append(row_data)
+            
+            for worksheet, rows in grouped.values():
+                self._append_with_retry(worksheet, rows)
+            
+            for _ in batch:
+                self._queue.task_done()
+    
+    @staticmethod
+    def _worksheet_key(worksheet) -> Tuple[Any, Any]:
+        """工作表的穩定標識 (spreadsheet ID, sheet ID)；缺少屬性時退回對象標識"""
+        spreadsheet_id = getattr(getattr(worksheet, 'spreadsheet', None), 'id', None)
+        sheet_id = getattr(worksheet, 'id', None)
+        if spreadsheet_id is None or sheet_id is None:
+            return ('object', id(worksheet))
+        return (spreadsheet_id, sheet_id)
+    
+    def _append_with_retry(self, worksheet, rows: List[List[Any]]) -> bool:
+        """追加數據行，僅對限流和服務端錯誤做指數退避重試"""
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                worksheet.append_rows(rows, value_input_option='RAW')
+                logger.debug(f"Background appended {len(rows)} rows to {worksheet.title}")
+                return True
+            except Exception as e:
+                status = getattr(getattr(e, 'response', None), 'status_code', None)
+                retryable = status is not None and (status == 429 or status >= 500)
+                if not retryable or attempt == self.MAX_RETRIES:
+                    logger.error(f"Background append of {len(rows)} rows failed: {e}")
+                    return False
+                logger.warning(f"Sheets append returned {status}, retrying")
+                time.sleep(self.RETRY_BACKOFF_SECONDS * (2 ** attempt))
+        return False
+
+
+_background_writer: Optional[BackgroundSheetsWriter] = None
+_background_writer_lock = threading.Lock()
+
+def get_background_writer() -> BackgroundSheetsWriter:
+    """獲取進程內共享的後台寫入器（首次調用時啟動線程）"""
+    global _background_writer
+    if _background_writer is None:
+        with _background_writer_lock:
+            if _background_writer is None:
+                _background_writer = BackgroundSheetsWriter()
+    return _background_writer
+
 class GoogleSheetsManager:
     """Google Sheets 統一管理器（支持反饋功能）"""
     
@@ -216,6 +302,32 @@ class GoogleSheetsManager:
         except Exception as e:
             logger.warning(f"Failed to update headers for {sheet_name}: {e}")
     
+    def _build_usage_row(self, usage_data: Dict[str, Any], sydney_time: datetime) -> List[Any]:
+        """構建 UsageLog 數據行 - 現在包含反饋列"""
+        return [
+            sydney_time.isoformat(),  # Timestamp (Sydney)
+            sydney_time.strftime('%Y-%m-%d'),  # Sydney Date
+            usage_data.get('user_id', ''),
+            usage_data.get('session_id', ''),
+            usage_data.get('translation_id', ''),
+            usage_data.get('daily_count', 0),
+            usage_data.get('session_count', 0),
+            usage_data.get('processing_time_ms', 0),
+            usage_data.get('file_type', 'text'),
+            usage_data.get('content_length', 0),
+            usage_data.get('status', 'success'),
+            usage_data.get('language', 'zh_CN'),
+            usage_data.get('device_info', ''),
+            usage_data.get('ip_hash', ''),
+            usage_data.get('user_agent', ''),
+            usage_data.get('error_message', ''),
+            usage_data.get('ai_model', 'gpt-4o-mini'),
+            usage_data.get('api_cost', 0),
+            json.dumps(usage_data.get('extra_data', {}), ensure_ascii=False),
+            usage_data.get('user_name', ''),  # 新增：用戶姓名
+            usage_data.get('user_feedback', '')  # 新增：用戶反饋
+        ]
+    
     def log_usage(self, usage_data: Dict[str, Any]) -> bool:
         """記錄使用數據（使用悉尼時間）"""
         try:
@@ -223,31 +335,7 @@ class GoogleSheetsManager:
             
             # 獲取悉尼時間
             sydney_time = _get_sydney_time()
-            
-            # 構建數據行 - 現在包含反饋列
-            row_data = [
-                sydney_time.isoformat(),  # Timestamp (Sydney)
-                sydney_time.strftime('%Y-%m-%d'),  # Sydney Date
-                usage_data.get('user_id', ''),
-                usage_data.get('session_id', ''),
-                usage_data.get('translation_id', ''),
-                usage_data.get('daily_count', 0),
-                usage_data.get('session_count', 0),
-                usage_data.get('processing_time_ms', 0),
-                usage_data.get('file_type', 'text'),
-                usage_data.get('content_length', 0),
-                usage_data.get('status', 'success'),
-                usage_data.get('language', 'zh_CN'),
-                usage_data.get('device_info', ''),
-                usage_data.get('ip_hash', ''),
-                usage_data.get('user_agent', ''),
-                usage_data.get('error_message', ''),
-                usage_data.get('ai_model', 'gpt-4o-mini'),
-                usage_data.get('api_cost', 0),
-                json.dumps(usage_data.get('extra_data', {}), ensure_ascii=False),
-                usage_data.get('user_name', ''),  # 新增：用戶姓名
-                usage_data.get('user_feedback', '')  # 新增：用戶反饋
-            ]
+            row_data = self._build_usage_row(usage_data, sydney_time)
             
             # 插入數據
             worksheet.append_row(row_data, value_input_option='RAW')
@@ -258,6 +346,17 @@ class GoogleSheetsManager:
             logger.error(f"Failed to log usage data: {e}")
             return False
     
+    def log_usage_async(self, usage_data: Dict[str, Any]) -> bool:
+        """在後台線程記錄使用數據，立即返回是否成功加入隊列"""
+        try:
+            worksheet = self.worksheets['UsageLog']
+            # 時間戳在提交時生成，不受隊列等待影響
+            row_data = self._build_usage_row(usage_data, _get_sydney_time())
+        except Exception as e:
+            logger.error(f"Failed to queue usage data: {e}")
+            return False
+        return get_background_writer().submit_row(worksheet, row_data)
+    
     def log_feedback_to_usage(self, feedback_data: Dict[str, Any]) -> bool:
         """專門記錄反饋到 UsageLog 表的方法"""
         try:
@@ -3,15 +3,33 @@ RadiAI.Care 文件處理模塊
 統一處理各種文件格式的文本提取
 """
 
-import fitz  # PyMuPDF for PDF
-import docx  # python-docx for Word documents
 import io
 import logging
+from functools import lru_cache
 from typing import Optional, Tuple, Dict, Any
+import streamlit as st
 from config.settings import AppConfig
 
+try:
+    from charset_normalizer import from_bytes
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=1)
+def _pymupdf():
+    """按需導入 PyMuPDF，純文本會話不承擔其加載開銷"""
+    import fitz
+    return fitz
+
+@lru_cache(maxsize=1)
+def _python_docx():
+    """按需導入 python-docx"""
+    import docx
+    return docx
+
 class FileHandler:
     """文件處理類，支持多種格式的文本提取"""
     
@@ -33,13 +51,17 @@ class FileHandler:
         if uploaded_file is None:
             return False, "沒有選擇文件"
         
+        return self._check_file(uploaded_file.name, _get_file_size(uploaded_file))
+    
+    def _check_file(self, file_name: str, file_size_bytes: int) -> Tuple[bool, str]:
+        """按文件名和大小檢查有效性，調用方負責讀取文件內容"""
         # 檢查文件大小
-        file_size_mb = len(uploaded_file.getvalue()) / (1024 * 1024)
+        file_size_mb = file_size_bytes / (1024 * 1024)
         if file_size_mb > self.max_size_mb:
             return False, f"文件過大，請上傳小於{self.max_size_mb}MB的文件"
         
         # 檢查文件類型
-        file_extension = uploaded_file.name.lower().split('.')[-1]
+        file_extension = file_name.lower().split('.')[-1]
         if file_extension not in self.supported_types:
             return False, f"不支持的文件格式，請上傳{', '.join(self.supported_types).upper()}文件"
         
@@ -55,30 +77,30 @@ class FileHandler:
         Returns:
             Tuple[Optional[str], Dict[str, Any]]: (提取的文本內容, 處理信息)
         """
-        # 先驗證文件
+        # 先驗證文件（只看文件名和大小，被拒絕的文件無需讀取內容）
         is_valid, error_msg = self.validate_file(uploaded_file)
         if not is_valid:
             logger.error(f"File validation failed: {error_msg}")
             return None, {"error": error_msg, "file_info": {}}
         
+        # 只讀取一次文件內容，統計和解析共用同一份字節
+        file_bytes = uploaded_file.getvalue()
+        
         file_extension = uploaded_file.name.lower().split('.')[-1]
         file_info = {
             "name": uploaded_file.name,
-            "size_kb": round(len(uploaded_file.getvalue()) / 1024, 2),
+            "size_kb": round(len(file_bytes) / 1024, 2),
             "type": file_extension
         }
         
         try:
-            if file_extension == 'txt':
-                text = self._extract_from_txt(uploaded_file)
-            elif file_extension == 'pdf':
-                text = self._extract_from_pdf(uploaded_file)
-            elif file_extension in ['docx', 'doc']:
-                text = self._extract_from_docx(uploaded_file)
-            else:
+            if file_extension not in ('txt', 'pdf', 'docx', 'doc'):
                 logger.error(f"Unsupported file type: {file_extension}")
                 return None, {"error": f"不支持的文件類型: {file_extension}", "file_info": file_info}
             
+            # 以文件內容為鍵緩存，Streamlit 重新運行時不再重複解析同一文件
+            text = _extract_text_cached(file_bytes, file_extension)
+            
             if text and text.strip():
                 return text.strip(), {"file_info": file_info, "success": True}
             else:
@@ -88,49 +110,48 @@ class FileHandler:
             logger.error(f"Text extraction failed for {file_extension}: {e}")
             return None, {"error": f"文本提取失敗: {str(e)}", "file_info": file_info}
     
-    def _extract_from_txt(self, uploaded_file) -> str:
+    @staticmethod
+    def _extract_from_txt(file_bytes: bytes) -> str:
         """從TXT文件提取文本"""
-        try:
-            content = uploaded_file.read().decode('utf-8')
-            return content.strip()
-        except UnicodeDecodeError:
-            # 嘗試其他編碼
+        # 依次嚴格解碼常見編碼；短文本的自動檢測並不可靠，例如短 GBK 文本會被誤判
+        for encoding in ('utf-8', 'gbk', 'big5'):
             try:
-                uploaded_file.seek(0)
-                content = uploaded_file.read().decode('gbk')
-                return content.strip()
+                return file_bytes.decode(encoding).strip()
             except UnicodeDecodeError:
-                try:
-                    uploaded_file.seek(0)
-                    content = uploaded_file.read().decode('big5')
-                    return content.strip()
-                except UnicodeDecodeError:
-                    uploaded_file.seek(0)
-                    content = uploaded_file.read().decode('latin-1')
-                    return content.strip()
+                continue
+        
+        # 以上編碼都失敗時才做自動檢測
+        if CHARSET_NORMALIZER_AVAILABLE:
+            best_match = from_bytes(file_bytes).best()
+            if best_match is not None:
+                return str(best_match).strip()
+        
+        return file_bytes.decode('latin-1').strip()
     
-    def _extract_from_pdf(self, uploaded_file) -> str:
+    @staticmethod
+    def _extract_from_pdf(file_bytes: bytes) -> str:
         """從PDF文件提取文本"""
-        pdf_document = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-        text_parts = []
+        buffer = io.StringIO()
         
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document[page_num]
-            page_text = page.get_text()
-            if page_text.strip():  # 只添加非空頁面
-                text_parts.append(page_text)
+        # 逐頁寫入緩衝區，不保留頁面列表；with 保證異常時也會關閉文檔
+        # 注意：PyMuPDF 不支持多線程訪問同一文檔，頁面必須在當前線程串行提取
+        with _pymupdf().open(stream=file_bytes, filetype="pdf") as pdf_document:
+            for page in pdf_document:
+                page_text = page.get_text("text")
+                if page_text and not page_text.isspace():  # 只添加非空頁面
+                    if buffer.tell():
+                        buffer.write("\n\n")
+                    buffer.write(page_text)
         
-        pdf_document.close()
-        return "\n\n".join(text_parts)
+        return buffer.getvalue()
     
-    def _extract_from_docx(self, uploaded_file) -> str:
+    @staticmethod
+    def _extract_from_docx(file_bytes: bytes) -> str:
         """從DOCX文件提取文本"""
-        document = docx.Document(uploaded_file)
-        text_parts = []
-        
-        for paragraph in document.paragraphs:
-            if paragraph.text.strip():
-                text_parts.append(paragraph.text.strip())
+        document = _python_docx().Document(io.BytesIO(file_bytes))
+        # paragraph.text 每次訪問都會重新拼接 runs，只取一次
+        paragraph_texts = (paragraph.text for paragraph in document.paragraphs)
+        text_parts = [text.strip() for text in paragraph_texts if text and not text.isspace()]
         
         return "\n\n".join(text_parts)
     
@@ -147,7 +168,7 @@ class FileHandler:
         if not uploaded_file:
             return {}
         
-        file_size_bytes = len(uploaded_file.getvalue())
+        file_size_bytes = _get_file_size(uploaded_file)
         file_extension = uploaded_file.name.lower().split('.')[-1]
         
         return {
@@ -159,3 +180,21 @@ class FileHandler:
             'is_supported': file_extension in self.supported_types,
             'is_valid_size': file_size_bytes / (1024 * 1024) <= self.max_size_mb
         }
+
+
+def _get_file_size(uploaded_file) -> int:
+    """獲取文件大小；Streamlit 的 UploadedFile 自帶 size，無需複製文件內容"""
+    size = getattr(uploaded_file, 'size', None)
+    if size is None:
+        size = len(uploaded_file.getvalue())
+    return size
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _extract_text_cached(file_bytes: bytes, file_extension: str) -> str:
+    """按文件內容緩存的文本提取（相同文件只解析一次）"""
+    if file_extension == 'txt':
+        return FileHandler._extract_from_txt(file_bytes)
+    if file_extension == 'pdf':
+        return FileHandler._extract_from_pdf(file_bytes)
+    return FileHandler._extract_from_docx(file_bytes)
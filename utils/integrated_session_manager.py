@@ -16,6 +16,24 @@ from dataclasses import dataclass, asdict
 
 logger = logging.getLogger(__name__)
 
+# 会话状态默认值；需要即时生成或可变的值以工厂函数表示，仅在键缺失时调用
+SESSION_STATE_DEFAULTS = {
+    "language": "简体中文",
+    "input_method": "text",
+    "user_session_id": lambda: uuid.uuid4().hex[:8],
+    "app_start_time": time.time,
+    "device_id": None,
+    "permanent_user_id": None,
+    "current_usage_session": None,
+    "quota_status": None,
+    "session_initialized": False,
+    "feedback_history": list,
+    "usage_efficiency_score": 1.0,
+    "satisfaction_history": list,
+    "bonus_quota_earned": 0,
+    "last_sync_time": 0
+}
+
 @dataclass
 class UsageSession:
     """使用会话数据类"""
@@ -76,26 +94,9 @@ class IntegratedSessionManager:
     def init_session_state(self):
         """初始化会话状态"""
         # 基础会话信息
-        defaults = {
-            "language": "简体中文",
-            "input_method": "text",
-            "user_session_id": str(uuid.uuid4())[:8],
-            "app_start_time": time.time(),
-            "device_id": None,
-            "permanent_user_id": None,
-            "current_usage_session": None,
-            "quota_status": None,
-            "session_initialized": False,
-            "feedback_history": [],
-            "usage_efficiency_score": 1.0,
-            "satisfaction_history": [],
-            "bonus_quota_earned": 0,
-            "last_sync_time": 0
-        }
-        
-        for key, value in defaults.items():
+        for key, default in SESSION_STATE_DEFAULTS.items():
             if key not in st.session_state:
-                st.session_state[key] = value
+                st.session_state[key] = default() if callable(default) else default
         
         # 生成或获取设备和用户ID
         self._setup_user_identity()
@@ -3,6 +3,10 @@ RadiAI.Care 提示詞模板管理（增強版）
 基於最新醫學 AI 研究優化的提示詞系統
 """
 
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8)
 def get_prompt(language: str) -> str:
     """
     獲取優化的翻譯提示詞
@@ -215,6 +219,7 @@ def get_processing_steps(language: str) -> list:
     return steps.get(language, steps["simplified_chinese"])
 
 
+@lru_cache(maxsize=8)
 def create_enhanced_disclaimer(language: str) -> str:
     """
     創建增強的免責聲明
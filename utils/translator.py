@@ -3,22 +3,145 @@ RadiAI.Care 翻譯引擎
 提供專業的醫學報告翻譯和內容驗證功能
 """
 
+import re
 import time
 import logging
-from typing import Dict, Any, List, Optional
-from openai import OpenAI
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from openai import OpenAI, APIError, APITimeoutError, RateLimitError
 import os
+import streamlit as st
 from config.settings import AppConfig
-from utils.prompt_template import get_prompt, create_enhanced_disclaimer, get_processing_steps
+from utils.prompt_template import get_prompt, create_enhanced_disclaimer
 
 logger = logging.getLogger(__name__)
 
+# 用戶消息的固定前綴，報告正文始終附加在最後，保證請求前綴逐字節一致
+USER_PROMPT_PREFIX = "請翻譯並解釋以下放射科報告：\n\n"
+
+
+@lru_cache(maxsize=8)
+def build_system_prompt(language_code: str) -> str:
+    """
+    構建指定語言的完整系統提示詞（每種語言只構建一次）
+    
+    靜態內容固定放在消息最前面，以便命中 OpenAI 的自動提示詞緩存。
+    
+    Args:
+        language_code: 語言代碼
+        
+    Returns:
+        str: 系統提示詞
+    """
+    system_prompt = get_prompt(language_code)
+    
+    # 添加上下文增強
+    return f"""
+            {system_prompt}
+            
+            請特別注意以下要點：
+            1. 醫學術語的準確翻譯和本地化
+            2. 保持原始報告的結構和邏輯
+            3. 提供通俗易懂的解釋，但不簡化重要資訊
+            4. 標明任何不確定或需要專業確認的內容
+            """
+
+
+@lru_cache(maxsize=4)
+def compile_keyword_pattern(keywords: Tuple[str, ...]) -> "re.Pattern":
+    """
+    將關鍵詞編譯為單個正則表達式，一次掃描即可找出全部關鍵詞
+    
+    關鍵詞按長度降序排列，並要求在詞首匹配（避免 "ct" 命中 "structure" 之類）。
+    
+    Args:
+        keywords: 關鍵詞元組
+        
+    Returns:
+        re.Pattern: 編譯後的正則表達式
+    """
+    alternation = '|'.join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf'\b(?:{alternation})', re.IGNORECASE)
+
+
+# 報告結構指標（子串匹配，與原先的 `in` 判斷一致）
+STRUCTURE_INDICATORS = (
+    'impression:', 'findings:', 'technique:', 'clinical history:',
+    'examination:', 'study:', 'conclusion:', 'recommendation:',
+    'images show', 'no evidence of', 'consistent with'
+)
+_STRUCTURE_PATTERN = re.compile('|'.join(map(re.escape, STRUCTURE_INDICATORS)), re.IGNORECASE)
+
+# 術語分類表
+EXAMINATION_TERMS = frozenset(['scan', 'ct', 'mri', 'xray', 'x-ray', 'ultrasound', 'mammogram'])
+ANATOMY_TERMS = frozenset(['chest', 'abdomen', 'brain', 'spine', 'lung', 'heart', 'liver'])
+FINDING_TERMS = frozenset(['lesion', 'mass', 'nodule', 'opacity', 'normal', 'abnormal'])
+
+
+class TranslationCache:
+    """翻譯結果緩存（按規範化報告文本和語言精確匹配，LRU 淘汰）"""
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(report_text: str, language_code: str) -> str:
+        """生成緩存鍵：小寫並合併空白後的文本 + 語言代碼的 SHA-256"""
+        normalized = ' '.join(report_text.lower().split())
+        return hashlib.sha256(f"{language_code}\x00{normalized}".encode()).hexdigest()
+    
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """讀取緩存，命中時標記為最近使用"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key: str, value: Tuple[str, str]) -> None:
+        """寫入緩存，超出容量時淘汰最久未使用的條目"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource
+def get_translation_cache() -> TranslationCache:
+    """獲取跨會話共享的翻譯結果緩存"""
+    return TranslationCache(AppConfig.TRANSLATION_CACHE_MAX_ENTRIES)
+
+
+@st.cache_resource
+def get_openai_client(api_key: str) -> OpenAI:
+    """
+    獲取跨會話共享的 OpenAI 客戶端
+    
+    客戶端內部的 httpx 連接池可保持長連接，後續請求無需重新建立 TCP/TLS 連接。
+    
+    Args:
+        api_key: OpenAI API 密鑰
+        
+    Returns:
+        OpenAI: 客戶端實例
+    """
+    # SDK 內建重試只針對連接錯誤、408/409/429 和 5xx，帶抖動的指數退避並遵循 Retry-After
+    return OpenAI(api_key=api_key, max_retries=AppConfig.OPENAI_MAX_RETRIES)
+
+
 class ContentValidator:
     """內容驗證器"""
     
     def __init__(self, config: AppConfig):
         self.config = config
         self.medical_keywords = config.MEDICAL_KEYWORDS
+        self._keyword_pattern = compile_keyword_pattern(tuple(self.medical_keywords))
         self.min_length = config.MIN_TEXT_LENGTH
         self.max_length = config.MAX_TEXT_LENGTH
     
@@ -32,17 +155,18 @@ class ContentValidator:
         Returns:
             Dict: 驗證結果
         """
-        if not text or not text.strip():
+        text = text.strip() if text else ""
+        if not text:
             return {
                 "is_valid": False,
                 "confidence": 0.0,
                 "found_terms": [],
+                "length_ok": False,
                 "issues": ["文本為空"],
                 "suggestions": ["請輸入有效的文本內容"],
                 "structure_score": 0
             }
         
-        text = text.strip()
         issues = []
         suggestions = []
         
@@ -64,8 +188,9 @@ class ContentValidator:
         # 計算信心度
         confidence = self._calculate_confidence(found_terms, structure_score, len(text))
         
-        # 驗證標準
-        is_valid = len(found_terms) >= 2 and len(text) >= self.min_length
+        # 驗證標準：長度在上下限之內且包含足夠的醫學術語
+        length_ok = self.min_length <= len(text) <= self.max_length
+        is_valid = length_ok and len(found_terms) >= 2
         
         if len(found_terms) < 2:
             issues.append("醫學術語過少")
@@ -77,6 +202,7 @@ class ContentValidator:
         
         return {
             "is_valid": is_valid,
+            "length_ok": length_ok,
             "confidence": confidence,
             "found_terms": found_terms,
             "issues": issues,
@@ -87,27 +213,18 @@ class ContentValidator:
     
     def _find_medical_terms(self, text: str) -> List[str]:
         """查找醫學術語"""
-        text_lower = text.lower()
-        found_terms = []
-        
-        for term in self.medical_keywords:
-            if term in text_lower:
-                found_terms.append(term)
-        
-        return list(set(found_terms))  # 去重
+        found_terms = {match.lower() for match in self._keyword_pattern.findall(text)}
+        return list(found_terms)  # 去重
     
     def _analyze_structure(self, text: str) -> int:
         """分析文本結構（0-100分）"""
-        text_lower = text.lower()
-        
-        # 檢查報告結構指標
-        structure_indicators = [
-            'impression:', 'findings:', 'technique:', 'clinical history:',
-            'examination:', 'study:', 'conclusion:', 'recommendation:',
-            'images show', 'no evidence of', 'consistent with'
-        ]
-        
-        found_indicators = sum(1 for indicator in structure_indicators if indicator in text_lower)
+        # 一次掃描統計不同的結構指標，達到滿分所需的 3 個即停止
+        seen = set()
+        for match in _STRUCTURE_PATTERN.finditer(text):
+            seen.add(match.group().lower())
+            if len(seen) >= 3:
+                break
+        found_indicators = len(seen)
         
         # 基於找到的結構指標計算分數
         if found_indicators >= 3:
@@ -147,16 +264,12 @@ class ContentValidator:
             'procedures': []
         }
         
-        examination_terms = ['scan', 'ct', 'mri', 'xray', 'x-ray', 'ultrasound', 'mammogram']
-        anatomy_terms = ['chest', 'abdomen', 'brain', 'spine', 'lung', 'heart', 'liver']
-        finding_terms = ['lesion', 'mass', 'nodule', 'opacity', 'normal', 'abnormal']
-        
         for term in found_terms:
-            if term in examination_terms:
+            if term in EXAMINATION_TERMS:
                 categories['examination_types'].append(term)
-            elif term in anatomy_terms:
+            elif term in ANATOMY_TERMS:
                 categories['anatomy'].append(term)
-            elif term in finding_terms:
+            elif term in FINDING_TERMS:
                 categories['findings'].append(term)
             else:
                 categories['procedures'].append(term)
@@ -166,9 +279,13 @@ class ContentValidator:
 class Translator:
     """增強型翻譯器"""
     
+    # 流式輸出時刷新頁面的最小間隔（秒）
+    STREAM_RENDER_INTERVAL = 0.1
+    
     def __init__(self):
         self.config = AppConfig()
         self.validator = ContentValidator(self.config)
+        self.last_from_cache = False
         self._init_openai_client()
     
     def _init_openai_client(self):
@@ -176,48 +293,39 @@ class Translator:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OpenAI API密鑰未設置")
-        self.client = OpenAI(api_key=api_key)
+        self.client = get_openai_client(api_key)
     
     def validate_content(self, text: str) -> Dict[str, Any]:
         """驗證內容"""
         return self.validator.validate_content(text)
     
     def translate_with_progress(self, report_text: str, language_code: str, 
-                              progress_bar, status_text) -> Dict[str, Any]:
+                              status_text=None) -> Dict[str, Any]:
         """
         帶進度顯示的翻譯功能
         
         Args:
             report_text: 報告文本
             language_code: 語言代碼
-            progress_bar: Streamlit 進度條
-            status_text: Streamlit 狀態文本
+            status_text: 可選的 Streamlit 狀態文本（同時用於流式顯示生成內容）
             
         Returns:
             Dict: 翻譯結果
         """
         try:
-            # 獲取處理步驟
-            steps = get_processing_steps(language_code)
-            
-            for i, step_text in enumerate(steps):
-                status_text.markdown(f"**🔄 {step_text}**")
-                progress_bar.progress(int((i + 1) / len(steps) * 85))
-                time.sleep(0.8)
-            
-            # 執行翻譯
-            status_text.markdown("**🤖 AI 正在生成解讀結果...**")
-            progress_bar.progress(95)
+            # 執行翻譯，生成內容邊到達邊顯示在狀態區
+            if status_text is not None:
+                status_text.markdown("**🤖 AI 正在生成解讀結果...**")
             
-            result_text, disclaimer_html = self._perform_translation(report_text, language_code)
-            
-            progress_bar.progress(100)
-            time.sleep(0.3)
+            result_text, disclaimer_html = self._perform_translation(
+                report_text, language_code, stream_placeholder=status_text
+            )
             
             return {
                 "success": True,
                 "content": result_text,
                 "disclaimer": disclaimer_html,
+                "from_cache": self.last_from_cache,
                 "error": None
             }
             
@@ -230,51 +338,112 @@ class Translator:
                 "error": str(e)
             }
     
-    def _perform_translation(self, report_text: str, language_code: str) -> tuple:
-        """執行實際的翻譯"""
-        try:
-            system_prompt = get_prompt(language_code)
-            
-            # 添加上下文增強
-            enhanced_prompt = f"""
-            {system_prompt}
-            
-            請特別注意以下要點：
-            1. 醫學術語的準確翻譯和本地化
-            2. 保持原始報告的結構和邏輯
-            3. 提供通俗易懂的解釋，但不簡化重要資訊
-            4. 標明任何不確定或需要專業確認的內容
-            """
+    def _perform_translation(self, report_text: str, language_code: str,
+                             stream_placeholder=None) -> tuple:
+        """
+        執行實際的翻譯（流式接收模型輸出）
+        
+        Args:
+            report_text: 報告文本
+            language_code: 語言代碼
+            stream_placeholder: 可選的 Streamlit 佔位元件，用於即時顯示已生成的內容
             
+        Returns:
+            tuple: (翻譯結果, 免責聲明HTML)
+        """
+        cache = get_translation_cache()
+        cache_key = cache.make_key(report_text, language_code)
+        cached = cache.get(cache_key)
+        self.last_from_cache = cached is not None
+        if cached is not None:
+            logger.info("Translation cache hit")
+            return cached
+        
+        try:
+            # 多份報告的合集（如 PDF 病歷包）同樣只發送一次請求：系統提示只計費一次，
+            # 拆分成多個請求反而會重複發送系統提示，並打散單一的解讀結果格式
             response = self.client.chat.completions.create(
                 model=self.config.OPENAI_MODEL,
                 messages=[
-                    {"role": "system", "content": enhanced_prompt},
-                    {"role": "user", "content": f"請翻譯並解釋以下放射科報告：\n\n{report_text}"}
+                    {"role": "system", "content": build_system_prompt(language_code)},
+                    {"role": "user", "content": USER_PROMPT_PREFIX + report_text}
                 ],
                 temperature=self.config.OPENAI_TEMPERATURE,
                 max_tokens=self.config.OPENAI_MAX_TOKENS,
-                timeout=self.config.OPENAI_TIMEOUT
+                timeout=self.config.OPENAI_TIMEOUT,
+                stream=True,
+                stream_options={"include_usage": True}
             )
             
-            result_text = response.choices[0].message.content.strip()
+            result_text = self._consume_stream(response, stream_placeholder).strip()
             disclaimer_html = create_enhanced_disclaimer(language_code)
             
+            cache.put(cache_key, (result_text, disclaimer_html))
             return result_text, disclaimer_html
             
         except Exception as e:
             logger.error(f"Translation error: {e}")
             error_msg = str(e).lower()
             
-            if "rate limit" in error_msg:
+            if isinstance(e, RateLimitError) or "rate limit" in error_msg:
                 raise Exception("API請求過於頻繁，請稍後重試")
-            elif "timeout" in error_msg:
+            elif isinstance(e, APITimeoutError) or "timeout" in error_msg:
                 raise Exception("請求超時，請檢查網路連線後重試")
-            elif "api" in error_msg or "openai" in error_msg:
+            elif isinstance(e, APIError) or "api" in error_msg or "openai" in error_msg:
                 raise Exception("AI服務暫時不可用，請稍後重試")
             else:
                 raise Exception(f"翻譯失敗：{str(e)}")
     
+    def _consume_stream(self, stream, placeholder=None) -> str:
+        """
+        讀取流式回應並拼接完整文本
+        
+        Args:
+            stream: OpenAI 流式回應
+            placeholder: 可選的 Streamlit 佔位元件，按固定間隔刷新已生成內容
+            
+        Returns:
+            str: 完整的回應文本
+        """
+        parts = []
+        last_render = 0.0
+        
+        for chunk in stream:
+            # 最後一個分塊只攜帶 usage 信息
+            if getattr(chunk, "usage", None) is not None:
+                self._log_prompt_cache_usage(chunk)
+            if not chunk.choices:
+                continue
+            
+            if chunk.choices[0].finish_reason == "length":
+                logger.warning("Translation output truncated at max_tokens")
+            
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            
+            if placeholder is not None:
+                now = time.monotonic()
+                if now - last_render >= self.STREAM_RENDER_INTERVAL:
+                    placeholder.markdown("".join(parts))
+                    last_render = now
+        
+        full_text = "".join(parts)
+        # 節流可能跳過最後幾個分塊，結束時補刷一次完整內容
+        if placeholder is not None and full_text:
+            placeholder.markdown(full_text)
+        return full_text
+    
+    @staticmethod
+    def _log_prompt_cache_usage(response) -> None:
+        """記錄提示詞緩存命中的 token 數"""
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None)
+        if cached_tokens is not None:
+            logger.info(f"Prompt cache: {cached_tokens}/{usage.prompt_tokens} prompt tokens cached")
+    
     def estimate_translation_time(self, text_length: int) -> str:
         """估算翻譯時間"""
         if text_length < 500: